@@ -3,14 +3,21 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Generator
+from typing import Any
 
+import dask
 import numpy as np
 import pytest
+from numpy.typing import NDArray
+from segy import SegyFile
 from segy.factory import SegyFactory
 from segy.schema import HeaderField
 from segy.standards import SegyStandard
 from segy.standards import get_segy_standard
 
+from mdio import MDIOReader
+from mdio.segy.compat import mdio_segy_spec
 from mdio.segy.geometry import StreamerShotGeometryType
 
 
@@ -83,27 +90,26 @@ def create_segy_mock_4d(
     )
 
     headers = factory.create_trace_header_template(trace_count)
-    samples = factory.create_trace_sample_template(trace_count)
 
-    for trc_idx in range(trace_count):
-        shot = shot_headers[trc_idx]
-        gun = gun_headers[trc_idx]
-        cable = cable_headers[trc_idx]
-        channel = channel_headers[trc_idx]
-        shot_line = 1
-        offset = 0
-
-        if index_receivers is False:
-            channel, gun, shot_line = 0, 0, 0
-
-        header_data = (shot, channel, shot, offset, shot_line, cable, gun)
-
-        fields = list(headers.dtype.names)
-        fields.remove("samples_per_trace")
-        fields.remove("sample_interval")
-
-        headers[fields][trc_idx] = header_data
-        samples[trc_idx] = np.linspace(start=shot, stop=shot + 1, num=num_samples)
+    # Sample ramp from shot to shot + 1, broadcast to all traces at once.
+    # It is passed to the encoder as-is, without copying into a template,
+    # and built as float32 so the encoder has no float64 to downcast.
+    ramp = np.linspace(0, 1, num_samples, dtype="float32")
+    samples = shot_headers[:, None].astype("float32") + ramp
+
+    shot_line = 1
+    if index_receivers is False:
+        channel_headers[:], gun_headers[:], shot_line = 0, 0, 0
+
+    # Header fields are filled column-wise; the template already carries
+    # the sample count and interval.
+    headers["field_rec_no"] = shot_headers
+    headers["channel"] = channel_headers
+    headers["shot_point"] = shot_headers
+    headers["offset"] = 0
+    headers["shot_line"] = shot_line
+    headers["cable"] = cable_headers
+    headers["gun"] = gun_headers
 
     with open(segy_path, mode="wb") as fp:
         fp.write(factory.create_textual_header())
@@ -113,7 +119,14 @@ def create_segy_mock_4d(
     return segy_path
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture
+def synchronous_dask() -> Generator[None, None, None]:
+    """Run Dask computations in-process and in order for the test."""
+    with dask.config.set(scheduler="synchronous"):
+        yield
+
+
+@pytest.fixture(scope="session")
 def segy_mock_4d_shots(fake_segy_tmp: str) -> dict[StreamerShotGeometryType, str]:
     """Generate mock 4D shot SEG-Y files."""
     num_samples = 25
@@ -136,3 +149,42 @@ def segy_mock_4d_shots(fake_segy_tmp: str) -> dict[StreamerShotGeometryType, str
         )
 
     return segy_paths
+
+
+@pytest.fixture(scope="module")
+def mdio_reader(zarr_tmp) -> MDIOReader:
+    """Open the imported MDIO once and share the reader across tests."""
+    return MDIOReader(os.fspath(zarr_tmp))
+
+
+@pytest.fixture(scope="module")
+def mdio_reader_dask(zarr_tmp) -> MDIOReader:
+    """Lazy (Dask backend) reader; slicing it does not fetch any chunks."""
+    return MDIOReader(os.fspath(zarr_tmp), backend="dask")
+
+
+@pytest.fixture(scope="module")
+def segy_input_snapshot(segy_input: str) -> dict[str, Any]:
+    """Parse the input SEG-Y once and keep what the round-trip tests need."""
+    segy = SegyFile(segy_input, spec=mdio_segy_spec())
+
+    return dict(
+        num_traces=segy.num_traces,
+        text_header=segy.text_header,
+        binary_header=segy.binary_header,
+        trace_offset=segy.spec.trace.offset,
+        trace_itemsize=segy.spec.trace.itemsize,
+    )
+
+
+@pytest.fixture(scope="module")
+def rand_trace_indices(segy_input_snapshot: dict[str, Any]) -> NDArray[np.int64]:
+    """Seeded, sorted random trace indices for round-trip comparisons."""
+    num_traces = segy_input_snapshot["num_traces"]
+
+    rng = np.random.default_rng(seed=42)
+    random_indices = rng.choice(num_traces, 100, replace=False)
+
+    # Sorted indices let the reader merge adjacent byte ranges.
+    random_indices.sort()
+    return random_indices
@@ -1,8 +1,8 @@
 """End to end testing for SEG-Y to MDIO conversion and back."""
 
+import os
 from os.path import getsize
 
-import dask
 import numpy as np
 import numpy.testing as npt
 import pytest
@@ -11,14 +11,13 @@ from segy import SegyFile
 from mdio import MDIOReader
 from mdio import mdio_to_segy
 from mdio.converters import segy_to_mdio
+from mdio.converters.exceptions import GridTraceSparsityError
 from mdio.core import Dimension
 from mdio.segy.compat import mdio_segy_spec
 from mdio.segy.geometry import StreamerShotGeometryType
 
 
-dask.config.set(scheduler="synchronous")
-
-
+@pytest.mark.usefixtures("synchronous_dask")
 @pytest.mark.parametrize("index_bytes", [(17, 137)])
 @pytest.mark.parametrize("index_names", [("shot_point", "cable")])
 @pytest.mark.parametrize("index_types", [("int32", "int16")])
@@ -41,10 +40,11 @@ class TestImport4DNonReg:
     ):
         """Test importing a SEG-Y file to MDIO."""
         segy_path = segy_mock_4d_shots[chan_header_type]
+        mdio_path = os.fspath(zarr_tmp)
 
         segy_to_mdio(
             segy_path=segy_path,
-            mdio_path_or_buffer=zarr_tmp.__str__(),
+            mdio_path_or_buffer=mdio_path,
             index_bytes=index_bytes,
             index_names=index_names,
             index_types=index_types,
@@ -55,24 +55,25 @@ class TestImport4DNonReg:
 
         # Expected values
         num_samples = 25
-        shots = [2, 3, 5, 6, 7, 8, 9]
-        cables = [0, 101, 201, 301]
+        shots = np.asarray([2, 3, 5, 6, 7, 8, 9])
+        cables = np.asarray([0, 101, 201, 301])
         receivers_per_cable = [1, 5, 7, 5]
 
         # QC mdio output
-        mdio = MDIOReader(zarr_tmp.__str__(), access_pattern="0123")
+        mdio = MDIOReader(mdio_path, access_pattern="0123")
         assert mdio.binary_header["samples_per_trace"] == num_samples
         grid = mdio.grid
 
         assert grid.select_dim(index_names[0]) == Dimension(shots, index_names[0])
         assert grid.select_dim(index_names[1]) == Dimension(cables, index_names[1])
         assert grid.select_dim("trace") == Dimension(
-            range(1, np.amax(receivers_per_cable) + 1), "trace"
+            np.arange(1, np.amax(receivers_per_cable) + 1), "trace"
         )
-        samples_exp = Dimension(range(0, num_samples, 1), "sample")
+        samples_exp = Dimension(np.arange(num_samples), "sample")
         assert grid.select_dim("sample") == samples_exp
 
 
+@pytest.mark.usefixtures("synchronous_dask")
 @pytest.mark.parametrize("index_bytes", [(17, 137, 13)])
 @pytest.mark.parametrize("index_names", [("shot_point", "cable", "channel")])
 @pytest.mark.parametrize("index_types", [("int32", "int16", "int32")])
@@ -95,26 +96,31 @@ class TestImport4D:
     ):
         """Test importing a SEG-Y file to MDIO."""
         segy_path = segy_mock_4d_shots[chan_header_type]
+        mdio_path = os.fspath(zarr_tmp)
+
+        # Expected values
+        num_samples = 25
+        shots = np.asarray([2, 3, 5, 6, 7, 8, 9])
+        cables = np.asarray([0, 101, 201, 301])
+        receivers_per_cable = [1, 5, 7, 5]
+
+        # Chunks sized to the mock survey, so the tiny dataset is not padded
+        # out to production-sized chunks.
+        chunksize = (len(shots), len(cables), max(receivers_per_cable), num_samples)
 
         segy_to_mdio(
             segy_path=segy_path,
-            mdio_path_or_buffer=zarr_tmp.__str__(),
+            mdio_path_or_buffer=mdio_path,
             index_bytes=index_bytes,
             index_names=index_names,
             index_types=index_types,
-            chunksize=(8, 2, 128, 1024),
+            chunksize=chunksize,
             overwrite=True,
             grid_overrides=grid_overrides,
         )
 
-        # Expected values
-        num_samples = 25
-        shots = [2, 3, 5, 6, 7, 8, 9]
-        cables = [0, 101, 201, 301]
-        receivers_per_cable = [1, 5, 7, 5]
-
         # QC mdio output
-        mdio = MDIOReader(zarr_tmp.__str__(), access_pattern="0123")
+        mdio = MDIOReader(mdio_path, access_pattern="0123")
         assert mdio.binary_header["samples_per_trace"] == num_samples
         grid = mdio.grid
 
@@ -123,17 +129,18 @@ class TestImport4D:
 
         if chan_header_type == StreamerShotGeometryType.B and grid_overrides is None:
             assert grid.select_dim(index_names[2]) == Dimension(
-                range(1, np.sum(receivers_per_cable) + 1), index_names[2]
+                np.arange(1, np.sum(receivers_per_cable) + 1), index_names[2]
             )
         else:
             assert grid.select_dim(index_names[2]) == Dimension(
-                range(1, np.amax(receivers_per_cable) + 1), index_names[2]
+                np.arange(1, np.amax(receivers_per_cable) + 1), index_names[2]
             )
 
-        samples_exp = Dimension(range(0, num_samples, 1), "sample")
+        samples_exp = Dimension(np.arange(num_samples), "sample")
         assert grid.select_dim("sample") == samples_exp
 
 
+@pytest.mark.usefixtures("synchronous_dask")
 @pytest.mark.parametrize("index_bytes", [(17, 137, 13)])
 @pytest.mark.parametrize("index_names", [("shot_point", "cable", "channel")])
 @pytest.mark.parametrize("index_types", [("int32", "int16", "int32")])
@@ -153,17 +160,13 @@ class TestImport4DSparse:
         chan_header_type,
     ):
         """Test importing a SEG-Y file to MDIO."""
-        import os
-
-        from mdio.converters.exceptions import GridTraceSparsityError
-
         segy_path = segy_mock_4d_shots[chan_header_type]
         os.environ["MDIO__GRID__SPARSITY_RATIO_LIMIT"] = "1.1"
 
         with pytest.raises(GridTraceSparsityError) as execinfo:
             segy_to_mdio(
                 segy_path=segy_path,
-                mdio_path_or_buffer=zarr_tmp.__str__(),
+                mdio_path_or_buffer=os.fspath(zarr_tmp),
                 index_bytes=index_bytes,
                 index_names=index_names,
                 index_types=index_types,
@@ -179,6 +182,7 @@ class TestImport4DSparse:
         )
 
 
+@pytest.mark.usefixtures("synchronous_dask")
 @pytest.mark.parametrize("index_bytes", [(133, 171, 17, 137, 13)])
 @pytest.mark.parametrize(
     "index_names", [("shot_line", "gun", "shot_point", "cable", "channel")]
@@ -205,10 +209,11 @@ class TestImport6D:
     ):
         """Test importing a SEG-Y file to MDIO."""
         segy_path = segy_mock_4d_shots[chan_header_type]
+        mdio_path = os.fspath(zarr_tmp)
 
         segy_to_mdio(
             segy_path=segy_path,
-            mdio_path_or_buffer=zarr_tmp.__str__(),
+            mdio_path_or_buffer=mdio_path,
             index_bytes=index_bytes,
             index_names=index_names,
             index_types=index_types,
@@ -219,19 +224,18 @@ class TestImport6D:
 
         # Expected values
         num_samples = 25
-        shots = [2, 3, 5, 6, 7, 8, 9]  # original shot list
+        shots = np.asarray([2, 3, 5, 6, 7, 8, 9])  # original shot list
         if grid_overrides is not None and "AutoShotWrap" in grid_overrides:
             shots_new = [
                 int(shot / 2) for shot in shots
             ]  # Updated shot index when ingesting with 2 guns
-            shots_set = set(shots_new)  # remove duplicates
-            shots = list(shots_set)  # Unique shot points for 6D indexed with gun
-        cables = [0, 101, 201, 301]
-        guns = [1, 2]
+            shots = np.unique(shots_new)  # Unique shot points for 6D indexed with gun
+        cables = np.asarray([0, 101, 201, 301])
+        guns = np.asarray([1, 2])
         receivers_per_cable = [1, 5, 7, 5]
 
         # QC mdio output
-        mdio = MDIOReader(zarr_tmp.__str__(), access_pattern="012345")
+        mdio = MDIOReader(mdio_path, access_pattern="012345")
         assert mdio.binary_header["samples_per_trace"] == num_samples
         grid = mdio.grid
 
@@ -241,25 +245,26 @@ class TestImport6D:
 
         if chan_header_type == StreamerShotGeometryType.B and grid_overrides is None:
             assert grid.select_dim(index_names[4]) == Dimension(
-                range(1, np.sum(receivers_per_cable) + 1), index_names[4]
+                np.arange(1, np.sum(receivers_per_cable) + 1), index_names[4]
             )
         else:
             assert grid.select_dim(index_names[4]) == Dimension(
-                range(1, np.amax(receivers_per_cable) + 1), index_names[4]
+                np.arange(1, np.amax(receivers_per_cable) + 1), index_names[4]
             )
 
-        samples_exp = Dimension(range(0, num_samples, 1), "sample")
+        samples_exp = Dimension(np.arange(num_samples), "sample")
         assert grid.select_dim("sample") == samples_exp
 
 
 @pytest.mark.dependency
+@pytest.mark.usefixtures("synchronous_dask")
 @pytest.mark.parametrize("index_bytes", [(17, 13)])
 @pytest.mark.parametrize("index_names", [("inline", "crossline")])
 def test_3d_import(segy_input, zarr_tmp, index_bytes, index_names):
     """Test importing a SEG-Y file to MDIO."""
     segy_to_mdio(
-        segy_path=segy_input.__str__(),
-        mdio_path_or_buffer=zarr_tmp.__str__(),
+        segy_path=segy_input,
+        mdio_path_or_buffer=os.fspath(zarr_tmp),
         index_bytes=index_bytes,
         index_names=index_names,
         overwrite=True,
@@ -270,53 +275,45 @@ def test_3d_import(segy_input, zarr_tmp, index_bytes, index_names):
 class TestReader:
     """Test reader functionality."""
 
-    def test_meta_read(self, zarr_tmp):
+    def test_meta_read(self, mdio_reader):
         """Metadata reading tests."""
-        mdio = MDIOReader(zarr_tmp.__str__())
-        assert mdio.binary_header["samples_per_trace"] == 1501
-        assert mdio.binary_header["sample_interval"] == 2000
+        assert mdio_reader.binary_header["samples_per_trace"] == 1501
+        assert mdio_reader.binary_header["sample_interval"] == 2000
 
-    def test_grid(self, zarr_tmp):
+    def test_grid(self, mdio_reader):
         """Grid reading tests."""
-        mdio = MDIOReader(zarr_tmp.__str__())
-        grid = mdio.grid
+        grid = mdio_reader.grid
 
-        assert grid.select_dim("inline") == Dimension(range(1, 346), "inline")
-        assert grid.select_dim("crossline") == Dimension(range(1, 189), "crossline")
-        assert grid.select_dim("sample") == Dimension(range(0, 3002, 2), "sample")
+        assert grid.select_dim("inline") == Dimension(np.arange(1, 346), "inline")
+        assert grid.select_dim("crossline") == Dimension(np.arange(1, 189), "crossline")
+        assert grid.select_dim("sample") == Dimension(np.arange(0, 3002, 2), "sample")
 
-    def test_get_data(self, zarr_tmp):
+    def test_get_data(self, mdio_reader_dask):
         """Data retrieval tests."""
-        mdio = MDIOReader(zarr_tmp.__str__())
+        mdio = mdio_reader_dask
 
         assert mdio.shape == (345, 188, 1501)
         assert mdio[0, :, :].shape == (188, 1501)
         assert mdio[:, 0, :].shape == (345, 1501)
         assert mdio[:, :, 0].shape == (345, 188)
 
-    def test_inline(self, zarr_tmp):
+    def test_inline(self, mdio_reader):
         """Read and compare every 75 inlines' mean and std. dev."""
-        mdio = MDIOReader(zarr_tmp.__str__())
-
-        inlines = mdio[::75, :, :]
+        inlines = mdio_reader[::75, :, :]
         mean, std = inlines.mean(), inlines.std()
 
         npt.assert_allclose([mean, std], [1.0555277e-04, 6.0027051e-01])
 
-    def test_crossline(self, zarr_tmp):
+    def test_crossline(self, mdio_reader):
         """Read and compare every 75 crosslines' mean and std. dev."""
-        mdio = MDIOReader(zarr_tmp.__str__())
-
-        xlines = mdio[:, ::75, :]
+        xlines = mdio_reader[:, ::75, :]
         mean, std = xlines.mean(), xlines.std()
 
         npt.assert_allclose([mean, std], [-5.0329847e-05, 5.9406823e-01])
 
-    def test_zslice(self, zarr_tmp):
+    def test_zslice(self, mdio_reader):
         """Read and compare every 225 z-slices' mean and std. dev."""
-        mdio = MDIOReader(zarr_tmp.__str__())
-
-        slices = mdio[:, :, ::225]
+        slices = mdio_reader[:, :, ::225]
         mean, std = slices.mean(), slices.std()
 
         npt.assert_allclose([mean, std], [0.005236923, 0.61279935])
@@ -326,31 +323,35 @@ class TestReader:
 class TestExport:
     """Test SEG-Y exporting functionaliy."""
 
+    @pytest.mark.usefixtures("synchronous_dask")
     def test_3d_export(self, zarr_tmp, segy_export_tmp):
         """Test 3D export to IBM and IEEE."""
         mdio_to_segy(
-            mdio_path_or_buffer=zarr_tmp.__str__(),
-            output_segy_path=segy_export_tmp.__str__(),
+            mdio_path_or_buffer=os.fspath(zarr_tmp),
+            output_segy_path=segy_export_tmp,
         )
 
     def test_size_equal(self, segy_input, segy_export_tmp):
         """Check if file sizes match on IBM file."""
         assert getsize(segy_input) == getsize(segy_export_tmp)
 
-    def test_rand_equal(self, segy_input, segy_export_tmp):
+    def test_rand_equal(
+        self, segy_input, segy_export_tmp, segy_input_snapshot, rand_trace_indices
+    ):
         """IBM. Is random original traces and headers match round-trip file?"""
-        spec = mdio_segy_spec()
-
-        in_segy = SegyFile(segy_input, spec=spec)
-        out_segy = SegyFile(segy_export_tmp, spec=spec)
-
-        num_traces = in_segy.num_traces
-        random_indices = np.random.choice(num_traces, 100, replace=False)
-        in_traces = in_segy.trace[random_indices]
-        out_traces = out_segy.trace[random_indices]
-
-        assert in_segy.num_traces == out_segy.num_traces
-        assert in_segy.text_header == out_segy.text_header
-        assert in_segy.binary_header == out_segy.binary_header
-        npt.assert_array_equal(in_traces.header, out_traces.header)
-        npt.assert_array_equal(in_traces.sample, out_traces.sample)
+        snapshot = segy_input_snapshot
+        out_segy = SegyFile(segy_export_tmp, spec=mdio_segy_spec())
+
+        assert snapshot["num_traces"] == out_segy.num_traces
+        assert snapshot["text_header"] == out_segy.text_header
+        assert snapshot["binary_header"] == out_segy.binary_header
+
+        # Round-trip must be bit-exact, so compare the undecoded trace
+        # records (header + samples) byte for byte.
+        trace_dtype = np.dtype((np.void, snapshot["trace_itemsize"]))
+        trace_offset = snapshot["trace_offset"]
+        memmap_kwargs = dict(dtype=trace_dtype, mode="r", offset=trace_offset)
+        in_traces = np.memmap(segy_input, **memmap_kwargs)[rand_trace_indices]
+        out_traces = np.memmap(segy_export_tmp, **memmap_kwargs)[rand_trace_indices]
+
+        assert in_traces.tobytes() == out_traces.tobytes()